@@ -8,9 +8,14 @@ Plant Disease Detection System
 import os
 import io
 import base64
+import asyncio
+import httpx
+import torch
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import gradio as gr
-from transformers import pipeline
+from transformers import pipeline, AutoImageProcessor, ImageClassificationPipeline
 from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnableSequence
@@ -30,37 +35,291 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 # Using a popular plant disease detection model
 HF_MODEL = "linkanjarad/mobilenet_v2_1.0_224-plant-disease-identification"
 
+# Number of images sent through the classifier in one forward pass
+CLASSIFIER_BATCH_SIZE = 8
+
+# Run on the first GPU when available, otherwise on CPU
+DEVICE = 0 if torch.cuda.is_available() else -1
+
+# Optional static int8 ONNX classifier for CPU hosts. It is only built when
+# ONNX_CALIBRATION_DIR points to a folder of representative leaf photos used
+# to calibrate activation ranges; check its latency and top-1 agreement with
+# the FP32 model on your hardware before enabling it
+ONNX_CALIBRATION_DIR = os.getenv("ONNX_CALIBRATION_DIR", "")
+USE_ONNX_QUANTIZATION = DEVICE == -1 and bool(ONNX_CALIBRATION_DIR)
+ONNX_MODEL_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "onnx_model",
+    HF_MODEL.replace("/", "--") + "-static-int8"
+)
+ONNX_MODEL_FILE = "model_quantized.onnx"
+
+# Uploads are downscaled so their shortest side matches the model's resize
+# step (256px, then center-cropped to 224px) before entering the pipeline
+PRE_RESIZE_SHORTEST_EDGE = 256
+
+# Dynamic micro-batching: concurrent requests are grouped into one pipeline
+# call of at most MAX_BATCH_SIZE images, waiting up to MAX_BATCH_LATENCY
+# seconds for the batch to fill
+MAX_BATCH_SIZE = CLASSIFIER_BATCH_SIZE
+MAX_BATCH_LATENCY = 0.05
+
+# Number of Gradio events allowed to run at the same time, and how many
+# more may wait in the queue before new submissions are rejected
+CONCURRENCY_LIMIT = 16
+QUEUE_MAX_SIZE = 64
+
+# Remedies are cached per disease and confidence bucket (in percent)
+REMEDY_CACHE_SIZE = 512
+CONFIDENCE_BUCKET = 5
+
+# Below this top-1 confidence (in percent) the LLM is not called and the
+# user is asked for a better photo instead
+MIN_REMEDY_CONFIDENCE = 40.0
+
+# Generation budget for the remedies answer; latency grows with each token
+REMEDY_MAX_TOKENS = 640
+
+# Groq connection pool: at most GROQ_MAX_CONNECTIONS open connections, of
+# which up to GROQ_MAX_KEEPALIVE_CONNECTIONS stay open while idle for
+# GROQ_KEEPALIVE_EXPIRY seconds. Requests within that window reuse an open
+# connection instead of doing a new TCP/TLS handshake
+GROQ_MAX_CONNECTIONS = 32
+GROQ_MAX_KEEPALIVE_CONNECTIONS = 20
+GROQ_KEEPALIVE_EXPIRY = 300
+
 # ============================================================================
 # MODEL INITIALIZATION
 # ============================================================================
 
-print("Loading Hugging Face model...")
-try:
-    # Initialize the image classification pipeline
-    disease_classifier = pipeline(
-        "image-classification",
-        model=HF_MODEL,
-        top_k=3  # Get top 3 predictions
-    )
-    print("✓ Hugging Face model loaded successfully")
-except Exception as e:
-    print(f"✗ Error loading Hugging Face model: {e}")
-    disease_classifier = None
-
-print("Initializing LangChain with Groq...")
-try:
-    # Initialize Groq with Llama 3.3 70B (free and powerful)
-    llm = ChatGroq(
-        model="llama-3.3-70b-versatile",  # You can also use: "mixtral-8x7b-32768", "llama-3.1-70b-versatile"
-        groq_api_key=GROQ_API_KEY,
-        temperature=0.7,
-        max_tokens=1024
+def load_quantized_model(image_processor):
+    """
+    Export the classifier to ONNX with static (QDQ) int8 quantization
+    
+    Activation ranges are calibrated on the images in ONNX_CALIBRATION_DIR.
+    The quantized model is saved to ONNX_MODEL_DIR, which is specific to
+    HF_MODEL, and reused on later startups.
+    
+    Args:
+        image_processor: Image processor used to build calibration inputs
+        
+    Returns:
+        ORTModelForImageClassification: Quantized ONNX Runtime model
+    """
+    # Optional dependencies: any import error falls back to PyTorch
+    from datasets import Dataset
+    from optimum.onnxruntime import ORTModelForImageClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoCalibrationConfig, AutoQuantizationConfig
+    
+    if not os.path.exists(os.path.join(ONNX_MODEL_DIR, ONNX_MODEL_FILE)):
+        print("Exporting model to ONNX and quantizing to int8...")
+        calibration_images = [
+            Image.open(os.path.join(ONNX_CALIBRATION_DIR, name)).convert("RGB")
+            for name in sorted(os.listdir(ONNX_CALIBRATION_DIR))
+            if name.lower().endswith((".jpg", ".jpeg", ".png"))
+        ]
+        if not calibration_images:
+            raise ValueError(f"No calibration images found in {ONNX_CALIBRATION_DIR}")
+        
+        pixel_values = image_processor(
+            images=calibration_images,
+            return_tensors="pt"
+        )["pixel_values"].numpy()
+        calibration_dataset = Dataset.from_dict({"pixel_values": list(pixel_values)})
+        
+        ort_model = ORTModelForImageClassification.from_pretrained(HF_MODEL, export=True)
+        quantizer = ORTQuantizer.from_pretrained(ort_model)
+        # Static QDQ quantization suits conv nets; dynamic ConvInteger is
+        # often slower than FP32 and hurts depthwise layers
+        quantization_config = AutoQuantizationConfig.avx512_vnni(
+            is_static=True,
+            per_channel=True
+        )
+        calibration_ranges = quantizer.fit(
+            dataset=calibration_dataset,
+            calibration_config=AutoCalibrationConfig.minmax(calibration_dataset),
+            operators_to_quantize=quantization_config.operators_to_quantize
+        )
+        quantizer.quantize(
+            save_dir=ONNX_MODEL_DIR,
+            quantization_config=quantization_config,
+            calibration_tensors_range=calibration_ranges
+        )
+    
+    return ORTModelForImageClassification.from_pretrained(
+        ONNX_MODEL_DIR,
+        file_name=ONNX_MODEL_FILE
     )
+
+
+class DiseaseClassificationPipeline(ImageClassificationPipeline):
+    """
+    Image classification pipeline tuned for the PyTorch MobileNetV2 model
+    
+    Runs forward passes under torch.inference_mode(), feeds conv layers
+    channels-last (NHWC) tensors and autocasts to autocast_dtype when set.
+    ONNX Runtime models are passed through unchanged.
+    """
+    
+    # Reduced-precision dtype for the forward pass; None keeps FP32
+    autocast_dtype = None
+    
+    def get_inference_context(self):
+        return torch.inference_mode
+    
+    def _forward(self, model_inputs):
+        if not isinstance(self.model, torch.nn.Module):
+            return super()._forward(model_inputs)
+        
+        model_inputs["pixel_values"] = model_inputs["pixel_values"].to(
+            memory_format=torch.channels_last
+        )
+        if self.autocast_dtype is None:
+            return super()._forward(model_inputs)
+        
+        with torch.autocast(device_type=self.device.type, dtype=self.autocast_dtype):
+            model_outputs = super()._forward(model_inputs)
+        # Softmax/top-k in postprocess run on full-precision logits
+        model_outputs["logits"] = model_outputs["logits"].float()
+        return model_outputs
+
+
+def select_autocast_dtype():
+    """
+    Pick the autocast dtype for the PyTorch classifier forward pass
+    
+    Returns:
+        torch.dtype: FP16 on GPU, BF16 on CPUs with native BF16 support,
+        or None to stay in FP32
+    """
+    if DEVICE >= 0:
+        return torch.float16
+    try:
+        # Emulated BF16 is slower than FP32, so require oneDNN support
+        if torch.ops.mkldnn._is_mkldnn_bf16_supported():
+            return torch.bfloat16
+    except Exception:
+        pass
+    return None
+
+
+def warm_up_classifier(classifier):
+    """
+    Run dummy images through the classifier at every batch size
+    
+    The micro-batcher sends batches of 1 to MAX_BATCH_SIZE images, and each
+    new shape triggers a recompile / CUDA graph recording for the compiled
+    model, plus cuDNN autotuning and ONNX Runtime session setup. Doing it
+    here keeps that cost out of live requests.
+    
+    Args:
+        classifier: Image classification pipeline to warm up
+    """
+    warmup_image = Image.new("RGB", (224, 224), "green")
+    for batch_size in range(1, MAX_BATCH_SIZE + 1):
+        classifier([warmup_image] * batch_size, batch_size=batch_size)
+
+
+def load_disease_classifier():
+    """
+    Load the Hugging Face disease classification pipeline
+    
+    Returns:
+        Pipeline: Image classification pipeline, or None if loading failed
+    """
+    print("Loading Hugging Face model...")
+    try:
+        # Torchvision-backed image processor: batched tensor resize/normalize
+        image_processor = AutoImageProcessor.from_pretrained(HF_MODEL, use_fast=True)
+        if DEVICE >= 0:
+            # Keep preprocessing on the GPU alongside the model
+            image_processor.device = f"cuda:{DEVICE}"
+        
+        classifier_model = HF_MODEL
+        if USE_ONNX_QUANTIZATION:
+            try:
+                classifier_model = load_quantized_model(image_processor)
+                print("✓ Using int8-quantized ONNX model")
+            except Exception as e:
+                print(f"✗ Error quantizing model, falling back to PyTorch: {e}")
+        
+        # Initialize the image classification pipeline
+        disease_classifier = pipeline(
+            "image-classification",
+            model=classifier_model,
+            image_processor=image_processor,
+            top_k=3,  # Get top 3 predictions
+            batch_size=CLASSIFIER_BATCH_SIZE,
+            device=DEVICE,
+            pipeline_class=DiseaseClassificationPipeline
+        )
+        warmed_up = False
+        if isinstance(disease_classifier.model, torch.nn.Module):
+            # Store conv weights as NHWC to match the channels-last inputs
+            disease_classifier.model = disease_classifier.model.to(
+                memory_format=torch.channels_last
+            ).eval()
+            disease_classifier.autocast_dtype = select_autocast_dtype()
+            
+            # Fuse the many small depthwise/pointwise conv ops into fewer kernels
+            eager_model = disease_classifier.model
+            try:
+                disease_classifier.model = torch.compile(
+                    eager_model,
+                    mode="reduce-overhead",
+                    fullgraph=False
+                )
+                # Pay the compilation cost now rather than on user requests
+                warm_up_classifier(disease_classifier)
+                warmed_up = True
+            except Exception as e:
+                print(f"✗ Error compiling model, using eager mode: {e}")
+                disease_classifier.model = eager_model
+        
+        if not warmed_up:
+            try:
+                warm_up_classifier(disease_classifier)
+            except Exception as e:
+                print(f"✗ Error warming up Hugging Face model: {e}")
+        print("✓ Hugging Face model loaded successfully")
+        return disease_classifier
+    except Exception as e:
+        print(f"✗ Error loading Hugging Face model: {e}")
+        return None
+
+
+def load_remedy_chain():
+    """
+    Initialize the Groq LLM and the LCEL remedy chain
     
-    # Create prompt template for disease remedies
-    remedy_prompt = PromptTemplate(
-        input_variables=["disease_name", "confidence"],
-        template="""You are an expert agricultural consultant specializing in plant diseases.
+    Returns:
+        RunnableSequence: Prompt | LLM chain, or None if initialization failed
+    """
+    print("Initializing LangChain with Groq...")
+    try:
+        # Shared HTTP/2 client with connection pooling: TLS sessions are
+        # reused and concurrent streams multiplex over one connection
+        http_async_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=GROQ_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=GROQ_KEEPALIVE_EXPIRY
+            )
+        )
+        
+        # Initialize Groq with Llama 3.3 70B (free and powerful)
+        llm = ChatGroq(
+            model="llama-3.3-70b-versatile",  # You can also use: "mixtral-8x7b-32768", "llama-3.1-70b-versatile"
+            groq_api_key=GROQ_API_KEY,
+            temperature=0.7,
+            http_async_client=http_async_client
+        )
+        
+        # Create prompt template for disease remedies
+        remedy_prompt = PromptTemplate(
+            input_variables=["disease_name", "confidence"],
+            template="""You are an expert agricultural consultant specializing in plant diseases.
 
 A plant disease has been detected with the following information:
 - Disease Name: {disease_name}
@@ -104,132 +363,405 @@ IMPORTANT: Use proper Markdown formatting:
 - Use bullet points with - for lists
 - Keep it well-structured and easy to read
 """
-    )
-    
-    # Create chain using LCEL (LangChain Expression Language)
-    remedy_chain = remedy_prompt | llm
-    print("✓ LangChain initialized successfully")
-except Exception as e:
-    print(f"✗ Error initializing LangChain: {e}")
-    llm = None
-    remedy_chain = None
+        )
+        
+        # Create chain using LCEL (LangChain Expression Language)
+        remedy_chain = remedy_prompt | llm.bind(max_tokens=REMEDY_MAX_TOKENS)
+        print("✓ LangChain initialized successfully")
+        return remedy_chain
+    except Exception as e:
+        print(f"✗ Error initializing LangChain: {e}")
+        return None
+
+
+# Load both models in parallel in the background so the UI starts right
+# away; callers wait on these futures only until loading has finished.
+# The classifier gets a dedicated single thread that also runs every later
+# batch: CUDA graphs recorded by torch.compile during warm-up are per
+# thread, and the pipeline itself is not thread-safe
+_classifier_executor = ThreadPoolExecutor(max_workers=1)
+_llm_executor = ThreadPoolExecutor(max_workers=1)
+_classifier_future = _classifier_executor.submit(load_disease_classifier)
+_remedy_chain_future = _llm_executor.submit(load_remedy_chain)
 
 # ============================================================================
 # CORE FUNCTIONS
 # ============================================================================
 
-def predict_disease(image):
+def format_predictions(predictions):
     """
-    Predict plant disease from image using Hugging Face model
+    Convert raw pipeline output for one image into display values
     
     Args:
-        image: PIL Image or numpy array
+        predictions: List of {'label', 'score'} dicts for a single image
         
     Returns:
-        tuple: (predictions_list, top_disease, top_confidence)
+        tuple: (predictions_text, top_disease, top_confidence)
+    """
+    # Extract top prediction
+    top_prediction = predictions[0]
+    disease_name = top_prediction['label']
+    confidence = top_prediction['score'] * 100
+    
+    # Format all predictions for display
+    predictions_text = "\n".join(
+        f"{i+1}. {pred['label']}: {pred['score']*100:.2f}%"
+        for i, pred in enumerate(predictions)
+    )
+    
+    return predictions_text, disease_name, confidence
+
+
+def downscale_image(image):
+    """
+    Convert a PIL image to RGB and shrink it to the model's resize size
+    
+    Args:
+        image: PIL Image
+        
+    Returns:
+        PIL Image: RGB image whose shortest side is at most PRE_RESIZE_SHORTEST_EDGE
+    """
+    # convert() always copies, so only call it for non-RGB (e.g. RGBA) inputs
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    scale = PRE_RESIZE_SHORTEST_EDGE / min(image.size)
+    if scale < 1:
+        new_size = (round(image.width * scale), round(image.height * scale))
+        image = image.resize(new_size, Image.Resampling.BILINEAR)
+    return image
+
+
+def classify_images(images):
+    """
+    Predict plant diseases for a batch of images using Hugging Face model
+    
+    All images are sent through the pipeline in a single call so they share
+    batched forward passes.
+    
+    Args:
+        images: List of PIL Images or numpy arrays
+        
+    Returns:
+        list: One (predictions_list, top_disease, top_confidence) tuple per image
     """
+    # Blocks only while the model is still loading in the background
+    disease_classifier = _classifier_future.result()
     if disease_classifier is None:
-        return None, "Model not loaded", 0.0
+        return [(None, "Model not loaded", 0.0)] * len(images)
     
     try:
-        # Run prediction
-        predictions = disease_classifier(image)
+        # Run prediction; returns one list of predictions per image
+        batch_predictions = disease_classifier(
+            images,
+            batch_size=CLASSIFIER_BATCH_SIZE
+        )
+        return [format_predictions(predictions) for predictions in batch_predictions]
+    
+    except Exception as e:
+        return [(None, f"Error during prediction: {str(e)}", 0.0)] * len(images)
+
+
+_batch_queue = None
+_batch_worker = None
+
+
+async def _run_batch_worker(queue):
+    """
+    Background task: collect queued images into batches and classify them
+    
+    Args:
+        queue: asyncio.Queue of (image, future) entries
+    """
+    loop = asyncio.get_running_loop()
+    
+    while True:
+        # Wait for the first request, then give others a short window to join
+        batch = [await queue.get()]
+        deadline = loop.time() + MAX_BATCH_LATENCY
         
-        # Extract top prediction
-        top_prediction = predictions[0]
-        disease_name = top_prediction['label']
-        confidence = top_prediction['score'] * 100
+        while len(batch) < MAX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
         
-        # Format all predictions for display
-        predictions_text = "\n".join([
-            f"{i+1}. {pred['label']}: {pred['score']*100:.2f}%"
-            for i, pred in enumerate(predictions)
-        ])
+        images = [image for image, _ in batch]
         
-        return predictions_text, disease_name, confidence
-    
-    except Exception as e:
-        return None, f"Error during prediction: {str(e)}", 0.0
+        try:
+            # Run the forward pass off the event loop so the UI stays
+            # responsive, on the thread the model was loaded and warmed on
+            results = await loop.run_in_executor(_classifier_executor, classify_images, images)
+        except Exception as e:
+            results = [(None, f"Error during prediction: {str(e)}", 0.0)] * len(batch)
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
 
 
-def get_remedies(disease_name, confidence):
+async def predict_disease(image):
     """
-    Get treatment remedies using Groq via LangChain
+    Predict plant disease from image using Hugging Face model
+    
+    The image is queued for the micro-batching worker, so concurrent calls
+    share a single pipeline invocation.
     
     Args:
-        disease_name: Name of the detected disease
-        confidence: Confidence score of the prediction
+        image: PIL Image or numpy array
         
     Returns:
-        str: Formatted remedies and treatment information
+        tuple: (predictions_list, top_disease, top_confidence)
     """
-    if remedy_chain is None:
-        return "⚠️ LangChain not initialized. Please set your GROQ_API_KEY environment variable."
+    global _batch_queue, _batch_worker
+    
+    # Start the worker on the running event loop the first time it is needed
+    if _batch_worker is None or _batch_worker.done():
+        _batch_queue = asyncio.Queue()
+        _batch_worker = asyncio.create_task(_run_batch_worker(_batch_queue))
+    
+    future = asyncio.get_running_loop().create_future()
+    await _batch_queue.put((image, future))
+    return await future
+
+
+# LRU cache of generated remedies keyed by (disease_name, confidence_bucket)
+_remedy_cache = OrderedDict()
+
+# Remedy generations currently streaming, keyed like _remedy_cache
+_inflight = {}
+
+
+class _InflightRemedy:
+    """Progress of one remedy generation, shared by every request awaiting it"""
+    
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self.error = None
+        self.truncated = False
+        self.condition = asyncio.Condition()
+        self.task = None
+
+
+async def _generate_remedies(remedy_chain, cache_key, inflight):
+    """
+    Background task: stream remedies for cache_key into an _InflightRemedy
+    
+    Runs independently of the requests reading it, so a client leaving
+    does not cancel the generation for the others.
     
+    Args:
+        remedy_chain: LCEL remedy chain
+        cache_key: (disease_name, confidence_bucket) tuple
+        inflight: _InflightRemedy receiving the streamed text
+    """
+    disease_name, bucket = cache_key
     try:
-        # Generate remedies using LangChain with LCEL
-        response = remedy_chain.invoke({
+        # Stream remedies using LangChain with LCEL
+        async for chunk in remedy_chain.astream({
             "disease_name": disease_name,
-            "confidence": f"{confidence:.2f}"
-        })
-        # Extract content from AIMessage
-        return response.content
+            "confidence": f"{bucket:.2f}"
+        }):
+            # Each chunk is an AIMessageChunk carrying the new tokens; the
+            # last one reports why generation stopped
+            async with inflight.condition:
+                inflight.text += chunk.content
+                if chunk.response_metadata.get("finish_reason") == "length":
+                    inflight.truncated = True
+                inflight.condition.notify_all()
     
-    except Exception as e:
-        return f"⚠️ Error generating remedies: {str(e)}\n\nPlease check your Groq API key."
+    except BaseException as e:
+        # Includes cancellation, so a partial stream is never cached
+        inflight.error = e
+        if not isinstance(e, Exception):
+            raise
+    
+    finally:
+        _inflight.pop(cache_key, None)
+        
+        # Only complete responses are cached, not ones cut off by
+        # REMEDY_MAX_TOKENS
+        if inflight.error is None and not inflight.truncated:
+            _remedy_cache[cache_key] = inflight.text
+            if len(_remedy_cache) > REMEDY_CACHE_SIZE:
+                _remedy_cache.popitem(last=False)
+        
+        async with inflight.condition:
+            inflight.done = True
+            inflight.condition.notify_all()
 
 
-def process_image(image):
+async def get_remedies(disease_name, confidence):
     """
-    Main processing function: predict disease and get remedies
+    Stream treatment remedies using Groq via LangChain
+    
+    Remedies are cached per disease and confidence bucket, so repeat
+    diagnoses are answered without calling the LLM. Concurrent requests
+    for the same key share a single in-flight generation.
     
     Args:
-        image: Input image from Gradio
+        disease_name: Name of the detected disease
+        confidence: Confidence score of the prediction
         
-    Returns:
-        tuple: (predictions_text, remedies_text)
+    Yields:
+        str: Remedies text generated so far
     """
-    if image is None:
-        return "⚠️ Please upload or capture an image first.", ""
+    remedy_chain = await asyncio.wrap_future(_remedy_chain_future)
+    if remedy_chain is None:
+        yield "⚠️ LangChain not initialized. Please set your GROQ_API_KEY environment variable."
+        return
     
-    # Step 1: Predict disease
-    predictions_text, disease_name, confidence = predict_disease(image)
+    # The prompt only depends on these two values, so repeats hit the cache
+    bucket = int(round(confidence / CONFIDENCE_BUCKET) * CONFIDENCE_BUCKET)
+    cache_key = (disease_name, bucket)
     
-    if predictions_text is None:
-        return disease_name, ""  # disease_name contains error message
+    if cache_key in _remedy_cache:
+        _remedy_cache.move_to_end(cache_key)
+        yield _remedy_cache[cache_key]
+        return
     
-    # Format prediction results with enhanced Markdown
-    prediction_output = f"""
+    # Join a generation already running for this key, or start one
+    inflight = _inflight.get(cache_key)
+    if inflight is None:
+        inflight = _InflightRemedy()
+        _inflight[cache_key] = inflight
+        inflight.task = asyncio.ensure_future(
+            _generate_remedies(remedy_chain, cache_key, inflight)
+        )
+    
+    remedies = ""
+    while True:
+        async with inflight.condition:
+            await inflight.condition.wait_for(
+                lambda: inflight.text != remedies or inflight.done
+            )
+            changed = inflight.text != remedies
+            remedies, done = inflight.text, inflight.done
+        
+        if done:
+            break
+        yield remedies
+    
+    if isinstance(inflight.error, Exception):
+        yield remedies + f"\n\n⚠️ Error generating remedies: {str(inflight.error)}\n\nPlease check your Groq API key."
+    elif inflight.error is not None:
+        # Cancelled (e.g. server shutdown) rather than failed
+        yield remedies + "\n\n⚠️ Remedy generation was interrupted. Please try again."
+    elif inflight.truncated:
+        yield remedies + "\n\n⚠️ *This answer reached the length limit and was cut short. Analyze the image again for a fresh answer.*"
+    elif changed:
+        yield remedies
+
+
+_llm_warmup_task = None
+
+
+async def warm_up_llm():
+    """
+    Open the Groq connection used for remedies
+    
+    Sends a one-token request through the async HTTP client on the serving
+    event loop, which is the client and loop that remedy streaming uses.
+    """
+    remedy_chain = await asyncio.wrap_future(_remedy_chain_future)
+    if remedy_chain is None:
+        return
+    
+    try:
+        # The chain's last step is the bound LLM; override its token budget
+        await remedy_chain.last.ainvoke("ping", max_tokens=1)
+    except Exception as e:
+        print(f"✗ Error warming up Groq: {e}")
+
+
+def start_llm_warmup():
+    """Start warm_up_llm once, in the background on the running event loop"""
+    global _llm_warmup_task
+    if _llm_warmup_task is None and GROQ_API_KEY:
+        _llm_warmup_task = asyncio.ensure_future(warm_up_llm())
+
+
+# Markdown layouts for the two result panels, filled in per request
+_PREDICTION_TEMPLATE = """
 # 🔍 Disease Detection Results
 
 ---
 
 ### 📊 Top Predictions:
 
-{predictions_text}
+{0}
 
 ---
 
 ### 🎯 Primary Diagnosis
 
-**Disease:** {disease_name}  
-**Confidence Level:** {confidence:.2f}%
+**Disease:** {1}  
+**Confidence Level:** {2:.2f}%
 
 ---
 """
-    
-    # Step 2: Get remedies from LLM
-    remedies_output = f"""
+
+_REMEDIES_TEMPLATE = """
 # 🌿 Treatment & Remedies
 
-## 📋 Detected Disease: **{disease_name}**
+## 📋 Detected Disease: **{0}**
 
 ---
 
 """
-    remedies_output += get_remedies(disease_name, confidence)
+
+
+async def process_image(image):
+    """
+    Main processing function: predict disease and get remedies
+    
+    Results are streamed: predictions are shown first, followed by the
+    remedies as the LLM generates them.
+    
+    Args:
+        image: Input PIL Image from Gradio
+        
+    Yields:
+        tuple: (predictions_text, remedies_text)
+    """
+    if image is None:
+        yield "⚠️ Please upload or capture an image first.", ""
+        return
+    
+    # Open the Groq connection while the first image is being classified;
+    # the remedies request then reuses it (HTTP/2 requests wait on a
+    # connection that is still being set up rather than opening another)
+    start_llm_warmup()
     
-    return prediction_output, remedies_output
+    # Shrink full-resolution uploads once with a cheap filter, off the event loop
+    loop = asyncio.get_running_loop()
+    image = await loop.run_in_executor(None, downscale_image, image)
+    
+    # Step 1: Predict disease
+    predictions_text, disease_name, confidence = await predict_disease(image)
+    
+    if predictions_text is None:
+        yield disease_name, ""  # disease_name contains error message
+        return
+    
+    # Format prediction results with enhanced Markdown
+    prediction_output = _PREDICTION_TEMPLATE.format(predictions_text, disease_name, confidence)
+    
+    # Remedies for an unreliable prediction would be noise; skip the LLM call
+    if confidence < MIN_REMEDY_CONFIDENCE:
+        yield prediction_output, "⚠️ Confidence too low — please upload a clearer image."
+        return
+    
+    # Step 2: Get remedies from LLM
+    remedies_output = _REMEDIES_TEMPLATE.format(disease_name)
+    yield prediction_output, remedies_output
+    
+    async for remedies in get_remedies(disease_name, confidence):
+        yield prediction_output, remedies_output + remedies
 
 
 # ============================================================================
@@ -284,7 +816,9 @@ def create_interface():
             with gr.Column(scale=1):
                 gr.Markdown("### 📸 Upload or Capture Image")
                 
-                # Image input with camera and upload options
+                # Image input with camera and upload options; kept as PIL
+                # because the pipeline's load_image accepts only str or PIL,
+                # and the fast image processor does the tensor conversion
                 image_input = gr.Image(
                     label="Plant Image",
                     type="pil",
@@ -367,6 +901,12 @@ if __name__ == "__main__":
     # Create and launch interface
     print("\n🚀 Launching Plant Disease Detection System...")
     demo = create_interface()
+    # Allow several requests in flight so the micro-batcher can group them
+    # and LLM calls overlap on the event loop
+    demo.queue(
+        default_concurrency_limit=CONCURRENCY_LIMIT,
+        max_size=QUEUE_MAX_SIZE
+    )
     demo.launch(
         server_name="0.0.0.0",
         server_port=7860,